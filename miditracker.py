@@ -1,11 +1,14 @@
+import collections
+import ctypes
+import ctypes.wintypes
 import logging
 import logging.handlers
 import mido
 import threading
 import pathlib
 import psutil
+import queue
 import sys
-import os
 import time
 
 logger = logging.getLogger(__name__)
@@ -15,12 +18,64 @@ LOG_DIRECTORY = pathlib.Path(__file__).parent.resolve().absolute()
 
 WRITE_TO_MIDI = False
 
+QUEUE_QUIET_NS = 100_000_000 # only push the queue once nothing has written to it for 100ms
+STATE_SETTLE_NS = 5_000_000 # extra quiet time after each state change
+
+# seconds between lighting controller checks, backs off while it keeps running and checks quickly once it's gone
+PROCESS_CHECK_INTERVAL = 10
+PROCESS_CHECK_INTERVAL_MAX = 30
+PROCESS_CHECK_INTERVAL_MISSING = 0.5
+
+# note state is stored flat, indexed by note_key(channel, note)
+NOTE_KEYS = 16 * 128
+NOTES_OFF = bytes(NOTE_KEYS) # copied over state to reset it in place
+# a single flush can queue a toggle for every key, with room left for pass-through notes queued meanwhile.
+# Past this the oldest unsent message is dropped, which only happens if the output port stalls and loses that button action
+SEND_QUEUE_MAX = 2 * NOTE_KEYS
+DESIRE_UNSET = 0
+DESIRE_ON = 1
+DESIRE_OFF = 2
+DESIRE_CLEARED = 3
+
+NOTE_MESSAGE_TYPES = ("note_on", "note_off") # the only messages handled, these always carry a channel
+
+# commands handled by the software thread, which owns all note state
+COMMAND_HARDWARE = 0
+COMMAND_STATE = 1
+COMMAND_RESET = 2
+
+def note_key(channel, note):
+    return (channel << 7) | note
+
+def split_note_key(key):
+    return key >> 7, key & 0x7F
+
+# used to hold a handle on the lighting controller process so liveness checks don't enumerate every process
+kernel32 = None
+winmm = None # raises the system timer resolution so short sleeps aren't rounded up to ~15ms
+if sys.platform == "win32":
+    winmm = ctypes.WinDLL("winmm")
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.argtypes = (ctypes.wintypes.DWORD, ctypes.wintypes.BOOL, ctypes.wintypes.DWORD)
+    kernel32.OpenProcess.restype = ctypes.wintypes.HANDLE
+    kernel32.WaitForSingleObject.argtypes = (ctypes.wintypes.HANDLE, ctypes.wintypes.DWORD)
+    kernel32.WaitForSingleObject.restype = ctypes.wintypes.DWORD
+    kernel32.CloseHandle.argtypes = (ctypes.wintypes.HANDLE,)
+    kernel32.CloseHandle.restype = ctypes.wintypes.BOOL
+SYNCHRONIZE = 0x00100000
+WAIT_TIMEOUT = 0x00000102
+
 class ProcessMonitor(threading.Thread):
     def __init__(self, process_name, midi_monitor):
         super().__init__()
         self.process_name = process_name
         self.midi_monitor = midi_monitor
         self._stop_event = threading.Event()
+        self._interval = PROCESS_CHECK_INTERVAL
+        self._running = None # result of the last check, None before the first one
+        self._tracked_exited = False # set by check_process() when the process it was holding on to has gone
+        self._process_handle = None
+        self._cached_pid = None # pid of the last process found, used where process handles aren't available
 
     def stop(self):
         self._stop_event.set()
@@ -28,23 +83,68 @@ class ProcessMonitor(threading.Thread):
     def run(self):
         try:
             while not self._stop_event.is_set():
-                if not self.check_process():
-                    print(f"Process '{self.process_name}' is not running. Resetting state.")
-                    self.midi_monitor.reset_state()
-                time.sleep(5)  # Check every 5 seconds
+                if self.check_process():
+                    if self._tracked_exited:
+                        # the instance being tracked exited and a new one started between checks
+                        logger.info("Process '%s' restarted. Resetting state.", self.process_name)
+                        self.midi_monitor.reset_state()
+                        self._interval = PROCESS_CHECK_INTERVAL
+                    elif self._running:
+                        self._interval = min(PROCESS_CHECK_INTERVAL_MAX, self._interval * 2)
+                    else:
+                        self._interval = PROCESS_CHECK_INTERVAL
+                    self._running = True
+                else:
+                    # only reset once when it goes away, the short interval is just to notice it coming back
+                    if self._running is not False:
+                        logger.info("Process '%s' is not running. Resetting state.", self.process_name)
+                        self.midi_monitor.reset_state()
+                    self._running = False
+                    self._interval = PROCESS_CHECK_INTERVAL_MISSING
+                if self._stop_event.wait(timeout=self._interval):
+                    break
         except KeyboardInterrupt:
             pass
+        finally:
+            self.close_process_handle()
 
     def check_process(self):
-        # Check if the process is running
-        for proc in psutil.process_iter(['pid', 'name']):
+        self._tracked_exited = False
+        # A held handle only needs a zero timeout wait, it signals once the process exits
+        if self._process_handle:
+            if kernel32.WaitForSingleObject(self._process_handle, 0) == WAIT_TIMEOUT:
+                return True
+            self.close_process_handle()
+            self._tracked_exited = True
+        elif self._cached_pid is not None:
+            try:
+                if psutil.Process(self._cached_pid).name() == self.process_name:
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+            self._cached_pid = None
+            self._tracked_exited = True
+
+        # Check if the process is running, process_iter reuses its Process objects between calls and notices reused pids
+        for proc in psutil.process_iter(['name']):
             if proc.info['name'] == self.process_name:
+                self.remember_process(proc.pid)
                 return True
         return False
 
-class MidiMonitor(threading.Thread):
+    def remember_process(self, pid):
+        if kernel32 is not None:
+            self._process_handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not self._process_handle:
+            self._cached_pid = pid
+
+    def close_process_handle(self):
+        if self._process_handle:
+            kernel32.CloseHandle(self._process_handle)
+        self._process_handle = None
+
+class MidiMonitor:
     def __init__(self, hardware_device_name, state_device_name, software_device_name, process_name):
-        super().__init__()
         self.hardware_device_name = hardware_device_name
         self.state_device_name = state_device_name
         self.software_device_name = software_device_name
@@ -55,230 +155,277 @@ class MidiMonitor(threading.Thread):
 
         self.process_name = process_name
         self._stop_event = threading.Event()
-        self.state = {}  # Dictionary to store note intensity values
-        self.desired_state = {}
-        self.desired_clear_state = {}
-
-        self.write_lock = threading.Lock()
-        self.write_time = time.time()
+        self.state = bytearray(NOTE_KEYS)  # 1 if the note is on, 0 if off or unknown
+        self.desired_state = bytearray(NOTE_KEYS) # DESIRE_UNSET / DESIRE_ON / DESIRE_OFF
+        self.desired_clear_state = bytearray(NOTE_KEYS) # DESIRE_UNSET / DESIRE_CLEARED
+        self.dirty_keys = collections.deque() # keys with an entry in desired_state or desired_clear_state, oldest first, never more than NOTE_KEYS
+        self.toggle_msg = mido.Message("note_on", velocity=1) # copied per send instead of building a new message
+        self.send_queue = collections.deque(maxlen=SEND_QUEUE_MAX) # all output goes through the sender thread
+        self.send_ready = threading.Event() # set whenever send_queue is appended to
+        self.commands = queue.SimpleQueue() # (COMMAND_*, msg) for the software thread
+        self.write_time = time.monotonic_ns()
 
     def stop(self):
         self.hardware_device.close()
         self.state_device.close()
-        self.software_device.close()
-        self._stop_event.set()
-
-    def desire_state_toggle(self, value):
-        self.write_time = time.time()
-
-        msg_channel = 0
-        if hasattr(value, "channel"):
-            msg_channel = value.channel
-
-        key = (msg_channel, value.note)
-        has_key = key in self.state
-        if (not has_key) or (has_key and (not self.state[key])):
-            self.desired_state[key] = True
-        elif has_key and self.state[key]:
-            self.desired_state[key] = False
-
-    def desire_state_on(self, value):
-        self.write_time = time.time()
-        key = (value.channel, value.note)
-        self.desired_state[key] = True
-
-    def desire_state_off(self, value):
-        self.write_time = time.time()
-        key = (value.channel, value.note)
-        self.desired_state[key] = False
-
-    def desire_state_cleared(self, value):
-        self.write_time = time.time()
-        key = (value.channel, value.note)
-        has_desired_state = key in self.desired_clear_state
-        if not has_desired_state: # only enforce state if no one has requested one yet
-            self.desired_clear_state[key] = False
+        self._stop_event.set() # software_device is closed by join() once the sender thread is done
+
+    def desire_state_toggle(self, channel, note):
+        self.write_time = time.monotonic_ns()
+        key = note_key(channel, note)
+        self.queue_key(key)
+        if not self.state[key]:
+            self.desired_state[key] = DESIRE_ON
+        else:
+            self.desired_state[key] = DESIRE_OFF
+
+    def desire_state_on(self, channel, note):
+        self.write_time = time.monotonic_ns()
+        key = note_key(channel, note)
+        self.queue_key(key)
+        self.desired_state[key] = DESIRE_ON
+
+    def desire_state_off(self, channel, note):
+        self.write_time = time.monotonic_ns()
+        key = note_key(channel, note)
+        self.queue_key(key)
+        self.desired_state[key] = DESIRE_OFF
+
+    def desire_state_cleared(self, channel, note):
+        self.write_time = time.monotonic_ns()
+        key = note_key(channel, note)
+        self.queue_key(key)
+        self.desired_clear_state[key] = DESIRE_CLEARED
     
-    def flush_queue(self):
-        # logger.info('Flush Queue')
-        self.write_time = time.time()
-        self.desired_state = {}
-        self.desired_clear_state = {}
-
-    # only allow pushing to the queue if nothing has written to it in 100ms
-    def can_push_queue(self, write_time):
-        return (time.time() - write_time) > 0.1
+    def queue_key(self, key):
+        # each key is queued once until it is flushed, which is what bounds dirty_keys
+        if self.desired_state[key] or self.desired_clear_state[key]:
+            return
+        self.dirty_keys.append(key)
 
-    def update_state(self, msg):
-        msg_channel = 0
-        if hasattr(msg, "channel"):
-            msg_channel = msg.channel
+    def unset_key(self, key):
+        self.desired_state[key] = DESIRE_UNSET
+        self.desired_clear_state[key] = DESIRE_UNSET
 
-        if msg.type == "note_on":
+    def flush_queue(self):
+        # logger.info('Flush Queue')
+        self.write_time = time.monotonic_ns()
+        for key in self.dirty_keys:
+            self.unset_key(key)
+        self.dirty_keys.clear()
+
+    def active_keys(self):
+        key = self.state.find(1)
+        while key != -1:
+            yield key
+            key = self.state.find(1, key + 1)
+
+    # only allow pushing to the queue if nothing has written to it in 100ms, returns the ns left to wait
+    def queue_push_delay(self, write_time):
+        return QUEUE_QUIET_NS - (time.monotonic_ns() - write_time)
+
+    def update_state(self, msg_type, msg_channel, msg_note, msg_velocity):
+        if msg_type == "note_on":
             # Update note intensity value
-            if msg.velocity > 0:
-                self.state[(msg_channel, msg.note)] = True
-            elif msg.velocity == 0:
-                self.state[(msg_channel, msg.note)] = False
+            if msg_velocity > 0:
+                self.state[note_key(msg_channel, msg_note)] = 1
+            elif msg_velocity == 0:
+                self.state[note_key(msg_channel, msg_note)] = 0
 
     def reset_state(self):
+        self.commands.put((COMMAND_RESET, None))
+
+    def clear_state(self):
         # logger.info('Reset State')
-        self.state = {}  # Reset note state dictionary
+        self.state[:] = NOTES_OFF  # Reset note state, in place so no new buffer is allocated
 
     def process_hardware_msg(self, msg):
+        logger.debug("Hardware: %s", msg)
         handled = False
-        msg_channel = 0
-        if hasattr(msg, "channel"):
-            msg_channel = msg.channel
+        msg_type = msg.type
+        if msg_type not in NOTE_MESSAGE_TYPES:
+            return
+        msg_channel = msg.channel
+        msg_note = msg.note
+        msg_velocity = msg.velocity
 
-        logger.info('{0} CH:{1} Note:{2} Vel:{3}'.format(msg.type, msg.channel, msg.note, msg.velocity))
+        logger.info('%s CH:%s Note:%s Vel:%s', msg_type, msg_channel, msg_note, msg_velocity)
 
-        if msg.type == "note_on":
-            if msg.velocity == 127: # special code, only turns on button
+        if msg_type == "note_on":
+            if msg_velocity == 127: # special code, only turns on button
                 handled = True
-                print("Turn On:", msg)
-                self.desire_state_on(
-                    mido.Message("note_on", channel=msg_channel, note=msg.note, velocity=1)
-                )
-        if msg.type == "note_off":
+                logger.debug("Turn On: %s", msg)
+                self.desire_state_on(msg_channel, msg_note)
+        if msg_type == "note_off":
             handled = True
-            if msg.note == 127: # special code, clear all active buttons
-                print("Clear All:", msg)
-                for key in list(self.state.keys()):
-                    self.desire_state_cleared(
-                        mido.Message("note_on", channel=key[0], note=key[1], velocity=1)
-                    )
+            if msg_note == 127: # special code, clear all active buttons
+                logger.debug("Clear All: %s", msg)
+                for key in list(self.active_keys()):
+                    self.desire_state_cleared(*split_note_key(key))
             else:
                 # All note_off events, only turns off button
-                print("Turn Off:", msg)
-                self.desire_state_off(
-                    mido.Message("note_on", channel=msg_channel, note=msg.note, velocity=1)
-                )
+                logger.debug("Turn Off: %s", msg)
+                self.desire_state_off(msg_channel, msg_note)
 
         # process unhandled regular messages
         if (not handled):
-            msg = mido.Message("note_on", channel=msg_channel, note=msg.note, velocity=1)
+            msg = self.toggle_msg.copy(channel=msg_channel, note=msg_note)
             if WRITE_TO_MIDI:
-                self.software_device.send(msg)
-            print("Toggle:", msg)
-            # self.desire_state_toggle(msg)
-
-    def hardware_thread_func(self):
+                self.queue_send(msg)
+            logger.debug("Toggle: %s", msg)
+            # self.desire_state_toggle(msg_channel, msg_note)
+
+    def process_state_msg(self, msg):
+        # logger.debug("State: %s", msg)
+        msg_type = msg.type
+        if msg_type not in NOTE_MESSAGE_TYPES:
+            return
+        msg_channel = msg.channel
+        msg_note = msg.note
+        msg_velocity = msg.velocity
+        logger.info('State CH:%s Note:%s Vel:%s', msg_channel, msg_note, msg_velocity)
+
+        # make sure queue doesn't get pushed
+        self.write_time = time.monotonic_ns() + STATE_SETTLE_NS # delay queue push by 5ms more after state change
+        self.update_state(msg_type, msg_channel, msg_note, msg_velocity)
+
+    # port callbacks only hand messages over to the software thread
+    def queue_hardware_msg(self, msg):
+        self.commands.put((COMMAND_HARDWARE, msg))
+
+    def queue_state_msg(self, msg):
+        self.commands.put((COMMAND_STATE, msg))
+
+    def queue_send(self, msg):
+        self.send_queue.append(msg)
+        self.send_ready.set()
+
+    def sender_thread_func(self):
+        send_queue = self.send_queue
+        send = self.software_device.send
         try:
-            for msg in self.hardware_device:
-                print("Hardware:", msg)
-                
-                # make sure queue doesn't get pushed
-                self.write_lock.acquire()
-                self.process_hardware_msg(msg)
-                self.write_lock.release()
-
-                if self._stop_event.is_set():
-                    break
-        except KeyboardInterrupt:
-            pass
-
-    def state_thread_func(self):
-        try:
-            for msg in self.state_device:
-                # print("State: ", msg)
-                msg_channel = 0
-                if hasattr(msg, "channel"):
-                    msg_channel = msg.channel
-                logger.info('State CH:{0} Note:{1} Vel:{2}'.format(msg_channel, msg.note, msg.velocity))
-
-                # make sure queue doesn't get pushed
-                self.write_lock.acquire()
-                self.write_time = time.time() + 0.005 # delay queue push by 5ms more after state change
-                self.update_state(msg)
-                self.write_lock.release()
-
-                if self._stop_event.is_set():
+            while True:
+                self.send_ready.wait()
+                self.send_ready.clear() # cleared before draining so a message appended meanwhile sets it again
+                while send_queue:
+                    send(send_queue.popleft())
+                if self._stop_event.is_set(): # join() wakes us once nothing else will be queued
                     break
         except KeyboardInterrupt:
             pass
 
     def software_thread_func(self):
+        # bind everything the loop touches to locals
+        stopped = self._stop_event.is_set
+        get_command = self.commands.get
+        process_hardware_msg = self.process_hardware_msg
+        process_state_msg = self.process_state_msg
+        queue_push_delay = self.queue_push_delay
+        dirty_keys = self.dirty_keys
+        state = self.state
+        desired_state = self.desired_state
+        desired_clear_state = self.desired_clear_state
+        copy_toggle_msg = self.toggle_msg.copy
+        send = self.queue_send
+        debug_enabled = logger.isEnabledFor
+        log_debug = logger.debug
         try:
-            while not self._stop_event.is_set():
-                time.sleep(0.005) # only check queue every 5ms
-                can_push_queue = self.can_push_queue(self.write_time)
-                if can_push_queue:
-                    desired_state_len = len(self.desired_state)
-                    desired_clear_state_len = len(self.desired_clear_state)
-                    if desired_state_len > 0 or desired_clear_state_len > 0:
-                        print("Pre State:", self.state)
-                        print("Pre Desired:", self.desired_state)
-                        print("Clear Desired:", self.desired_clear_state)
-
-                    for key in list(self.desired_clear_state.keys()):
-                        if not (key in self.desired_state): # only clear state if no pre-existing intent
-                            self.desired_state[key] = False
-
-                    if desired_state_len > 0 or desired_clear_state_len > 0:
-                        print("Post Desired:", self.desired_state)
-
-                    for key in list(self.desired_state.keys()):
-                        state_desire = self.desired_state[key]
-                        state_current = False
-                        if key in self.state:
-                            state_current = self.state[key]
-
-                        if state_current != state_desire:
-                            msg = mido.Message("note_on", channel=key[0], note=key[1], velocity=1)
-                            if WRITE_TO_MIDI:
-                                self.software_device.send(msg)
-                            print("Toggle:", msg)
-
-                    # flush queues
-                    if desired_state_len > 0 or desired_clear_state_len > 0:
-                        print("Post State:", self.state)
-                        self.write_lock.acquire()
-                        self.write_time = time.time()
-                        self.flush_queue()
-                        self.write_lock.release()
+            while not stopped():
+                # handle incoming commands until the queue has been quiet for 100ms
+                push_delay = queue_push_delay(self.write_time)
+                if push_delay > 0 or not dirty_keys:
+                    try:
+                        command, msg = get_command(timeout=push_delay / 1e9 if push_delay > 0 else 0.1)
+                    except queue.Empty:
+                        continue
+                    if command == COMMAND_HARDWARE:
+                        process_hardware_msg(msg)
+                    elif command == COMMAND_STATE:
+                        process_state_msg(msg)
+                    elif command == COMMAND_RESET:
+                        self.clear_state()
+                    continue
+
+                debug = debug_enabled(logging.DEBUG) # skip building the state dumps when they won't be logged
+                if debug:
+                    log_debug("Pre State: %s", [split_note_key(key) for key in self.active_keys()])
+                    log_debug("Pre Desired: %s", {split_note_key(key): desired_state[key] for key in dirty_keys})
+                    log_debug("Clear Desired: %s", {split_note_key(key): desired_clear_state[key] for key in dirty_keys})
+
+                for key in dirty_keys:
+                    desire = desired_state[key]
+                    if desired_clear_state[key] and not desire: # only clear state if no pre-existing intent
+                        desire = DESIRE_OFF
+
+                    state_desire = desire == DESIRE_ON
+                    state_current = state[key] == 1
+
+                    if state_current != state_desire:
+                        msg = copy_toggle_msg(channel=key >> 7, note=key & 0x7F)
+                        if WRITE_TO_MIDI:
+                            send(msg)
+                        log_debug("Toggle: %s", msg)
+
+                # flush queues
+                self.flush_queue()
+
+                if debug:
+                    log_debug("Post State: %s", [split_note_key(key) for key in self.active_keys()])
         except KeyboardInterrupt:
             pass
 
-    def run(self):
-        process_monitor = ProcessMonitor(self.process_name, self)
-        process_monitor.start()
+    def start(self):
+        self.process_monitor = ProcessMonitor(self.process_name, self)
+        self.process_monitor.start()
 
-        hardware_thread = threading.Thread(target=self.hardware_thread_func)
-        hardware_thread.start()
+        # inputs are delivered on the MIDI backend's own thread
+        self.hardware_device.callback = self.queue_hardware_msg
+        self.state_device.callback = self.queue_state_msg
 
-        state_thread = threading.Thread(target=self.state_thread_func)
-        state_thread.start()
+        self.software_thread = threading.Thread(target=self.software_thread_func)
+        self.software_thread.start()
 
-        software_thread = threading.Thread(target=self.software_thread_func)
-        software_thread.start()
+        self.sender_thread = threading.Thread(target=self.sender_thread_func)
+        self.sender_thread.start()
 
-        try:
-            while not self._stop_event.is_set():
-                time.sleep(1)  # Adjust as needed
-        except KeyboardInterrupt:
-            pass
-        finally:
-            process_monitor.stop()
-            process_monitor.join()
-            hardware_thread.join()
-            state_thread.join()
-            software_thread.join()
+        if winmm is not None:
+            winmm.timeBeginPeriod(1)
+
+    def join(self):
+        # called once after stop()
+        self.process_monitor.stop()
+        self.process_monitor.join()
+        self.software_thread.join()
+        self.send_ready.set()
+        self.sender_thread.join()
+        self.software_device.close()
+        if winmm is not None:
+            winmm.timeEndPeriod(1)
+
+stop_requested = threading.Event() # stop() can run before main() has set running_monitor
+running_monitor = None # set by main() so stop() can end it from another thread
 
 def stop():
-    os._exit(1)
+    stop_requested.set()
+    if running_monitor is not None:
+        running_monitor.stop()
 
 class UnixTimeFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
         return str(record.created - launch_time)
 
 def main():
+    global running_monitor
     LOG_FILE = str(LOG_DIRECTORY) + '\midi.log'
     print("Logging file:", LOG_FILE)
     handler = logging.handlers.TimedRotatingFileHandler(LOG_FILE, when='midnight', backupCount=12)
     formatter = UnixTimeFormatter('%(asctime)s - %(levelname)s - %(message)s')
     handler.setFormatter(formatter)
-    logger.addHandler(handler)
+    # records are written out by a listener thread so file I/O stays off the MIDI threads
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    log_listener = logging.handlers.QueueListener(log_queue, handler)
+    log_listener.start()
     logger.setLevel(logging.DEBUG)
 
     # Replace 'Your MIDI Device Name' with the name of your MIDI device
@@ -293,21 +440,22 @@ def main():
     
     process_name = "TheLightingController.exe"
 
-    midi_monitor = MidiMonitor(hardware_device_name, state_device_name, software_device_name, process_name)
+    midi_monitor = running_monitor = MidiMonitor(hardware_device_name, state_device_name, software_device_name, process_name)
     midi_monitor.start()
+    if stop_requested.is_set(): # stop() ran before running_monitor was set
+        midi_monitor.stop()
 
     try:
-        while True:
+        # sleep on the stop event instead of spinning, waking every second so Ctrl+C is still delivered on Windows
+        while not midi_monitor._stop_event.wait(timeout=1):
             pass
     except KeyboardInterrupt:
         print("\nStopping MIDI monitoring...")
-
         midi_monitor.stop()
-         # Wait for threads to terminate with a timeout
-        midi_monitor.join(timeout=1)  # Timeout set to 1 seconds
-        if midi_monitor.is_alive():
-            print("Threads failed to terminate. Exiting without clean shutdown.", file=sys.stderr)
-            os._exit(1) # Exit with an error code if threads fail to terminate within the timeout
+
+    # every worker wakes on the stop event, so this returns once they have all wound down
+    midi_monitor.join()
+    log_listener.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,28 +1,40 @@
+import collections
 import logging
 import logging.handlers
 import mido
 import threading
 import pathlib
 import psutil
-import sys
-import os
 import time
-from queue import Queue
-from dataclasses import dataclass
-from typing import Dict, Tuple, Optional
+from typing import Deque, Dict, Optional
 
 logger = logging.getLogger(__name__)
 launch_time = time.time()
 
 LOG_DIRECTORY = pathlib.Path(__file__).parent.resolve().absolute()
 WRITE_TO_MIDI = False
+EMIT_INTERVAL_NS = 100_000_000  # minimum time between changes sent for one note
+NOTE_MESSAGE_TYPES = ("note_on", "note_off")  # the only messages handled, these always carry a channel
+# seconds between lighting controller checks, backs off while it keeps running and checks quickly once it's gone
+PROCESS_CHECK_INTERVAL = 10
+PROCESS_CHECK_INTERVAL_MAX = 30
+PROCESS_CHECK_INTERVAL_MISSING = 0.5
 
-@dataclass
-class StateChange:
-    channel: int
-    note: int
-    value: bool
-    timestamp: float
+def note_key(channel, note):
+    # channel is 0-15 and note 0-127, so both fit in one small int
+    return (channel << 7) | note
+
+def split_note_key(key):
+    return key >> 7, key & 0x7F
+
+class NoteSlot:
+    __slots__ = ("value", "desired", "last_emit", "queued")
+
+    def __init__(self):
+        self.value = False  # last state reported by the DMX software
+        self.desired = False
+        self.last_emit: Optional[int] = None  # time.monotonic_ns() of the last change sent, until the state update arrives
+        self.queued = False  # key is waiting in dirty_keys, later changes only update desired
 
 class ProcessMonitor(threading.Thread):
     def __init__(self, process_name, midi_monitor):
@@ -30,6 +42,10 @@ class ProcessMonitor(threading.Thread):
         self.process_name = process_name
         self.midi_monitor = midi_monitor
         self._stop_event = threading.Event()
+        self._cached_pid: Optional[int] = None
+        self._interval = PROCESS_CHECK_INTERVAL
+        self._running: Optional[bool] = None  # result of the last check, None before the first one
+        self._tracked_exited = False  # set by check_process() when the process it was holding on to has gone
 
     def stop(self):
         self._stop_event.set()
@@ -37,191 +53,242 @@ class ProcessMonitor(threading.Thread):
     def run(self):
         try:
             while not self._stop_event.is_set():
-                if not self.check_process():
-                    logger.info(f"Process '{self.process_name}' is not running. Resetting state.")
-                    self.midi_monitor.reset_state()
-                time.sleep(5)
+                if self.check_process():
+                    if self._tracked_exited:
+                        # the instance being tracked exited and a new one started between checks
+                        logger.info("Process '%s' restarted. Resetting state.", self.process_name)
+                        self.midi_monitor.reset_state()
+                        self._interval = PROCESS_CHECK_INTERVAL
+                    elif self._running:
+                        self._interval = min(PROCESS_CHECK_INTERVAL_MAX, self._interval * 2)
+                    else:
+                        self._interval = PROCESS_CHECK_INTERVAL
+                    self._running = True
+                else:
+                    # only reset once when it goes away, the short interval is just to notice it coming back
+                    if self._running is not False:
+                        logger.info("Process '%s' is not running. Resetting state.", self.process_name)
+                        self.midi_monitor.reset_state()
+                    self._running = False
+                    self._interval = PROCESS_CHECK_INTERVAL_MISSING
+                if self._stop_event.wait(timeout=self._interval):
+                    break
         except KeyboardInterrupt:
             pass
 
     def check_process(self):
-        for proc in psutil.process_iter(['pid', 'name']):
+        self._tracked_exited = False
+        # Probe the last pid found before falling back to a scan of every process
+        if self._cached_pid is not None:
+            try:
+                if psutil.Process(self._cached_pid).name() == self.process_name:
+                    return True
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+            self._cached_pid = None
+            self._tracked_exited = True
+
+        for proc in psutil.process_iter(['name']):
             if proc.info['name'] == self.process_name:
+                self._cached_pid = proc.pid
                 return True
         return False
 
-class MidiMonitor(threading.Thread):
+class MidiMonitor:
     def __init__(self, hardware_device_name, state_device_name, software_device_name, process_name):
-        super().__init__()
         self.hardware_device_name = hardware_device_name
         self.state_device_name = state_device_name
         self.software_device_name = software_device_name
         self.process_name = process_name
         
-        # Thread-safe queues for message passing
-        self.state_queue = Queue()
-        self.hardware_queue = Queue()
-        self.output_queue = Queue()
-        
         # Thread synchronization
         self._stop_event = threading.Event()
         self.state_lock = threading.Lock()
+        self.dirty_ready = threading.Event()  # set when keys are added to dirty_keys
         
         # State management
-        self.current_state: Dict[Tuple[int, int], bool] = {}
-        self.pending_changes: Dict[Tuple[int, int], StateChange] = {}
+        self.notes: Dict[int, NoteSlot] = {}
+        self.dirty_keys: Deque[int] = collections.deque()  # keys whose desired value changed, each queued once
         
-        # Device initialization
-        self.hardware_device = mido.open_input(self.hardware_device_name)
-        self.state_device = mido.open_input(self.state_device_name)
+        # Device initialization, inputs are handled on the MIDI backend's callback thread
         self.software_device = mido.open_output(self.software_device_name)
+        self.hardware_device = mido.open_input(self.hardware_device_name, callback=self.on_hardware_message)
+        self.state_device = mido.open_input(self.state_device_name, callback=self.on_state_message)
 
     def stop(self):
         self._stop_event.set()
+        self.dirty_ready.set()
         self.hardware_device.close()
-        self.state_device.close()
-        self.software_device.close()
+        self.state_device.close()  # software_device is closed by join() once the output thread is done
 
     def reset_state(self):
         with self.state_lock:
-            self.current_state.clear()
-            self.pending_changes.clear()
+            self.notes.clear()
+
+    def get_slot(self, key: int) -> NoteSlot:
+        slot = self.notes.get(key)
+        if slot is None:
+            slot = self.notes[key] = NoteSlot()
+        return slot
+
+    def discard_idle_slot(self, key: int, slot: NoteSlot):
+        # caller holds state_lock, an off note with nothing queued or in flight needs no slot
+        if not slot.value and not slot.queued and slot.last_emit is None:
+            del self.notes[key]
 
-    def process_hardware_message(self, msg: mido.Message) -> Optional[StateChange]:
-        channel = getattr(msg, 'channel', 0)
-        logger.info(f'Hardware CH:{channel} Note:{msg.note} Vel:{msg.velocity}')
+    def desire(self, key: int, value: bool):
+        # caller holds state_lock
+        slot = self.get_slot(key)
+        slot.desired = value
+        if not slot.queued:
+            slot.queued = True
+            self.dirty_keys.append(key)
 
-        if msg.type == "note_on" and msg.velocity == 127:
+    def process_hardware_message(self, msg: mido.Message):
+        mtype = msg.type
+        if mtype not in NOTE_MESSAGE_TYPES:
+            return
+        channel = msg.channel
+        note = msg.note
+        velocity = msg.velocity
+        key = note_key(channel, note)
+        logger.info('Hardware CH:%d Note:%d Vel:%d', channel, note, velocity)
+
+        if mtype == "note_on" and velocity == 127:
             # Special code to turn on button
-            logger.info(f"Turning on CH:{channel} Note:{msg.note}.")
-            return StateChange(channel, msg.note, True, time.time())
-        elif msg.type == "note_off":
-            if msg.note == 127:
+            logger.info("Turning on CH:%d Note:%d.", channel, note)
+            with self.state_lock:
+                self.desire(key, True)
+        elif mtype == "note_off":
+            if note == 127:
                 # Special code to clear all buttons
                 with self.state_lock:
-                    for key in self.current_state.keys():
-                        logger.info(f"Queueing turning off CH:{key[0]} Note:{key[1]}.")
-                        self.output_queue.put(
-                            StateChange(key[0], key[1], False, time.time())
-                        )
-                return None
+                    for key, slot in self.notes.items():
+                        if slot.value:
+                            logger.info("Queueing turning off CH:%d Note:%d.", *split_note_key(key))
+                            self.desire(key, False)
             else:
                 # Turn off specific button
-                logger.info(f"Turning off CH:{channel} Note:{msg.note}.")
-                return StateChange(channel, msg.note, False, time.time())
-        elif msg.type == "note_on":
+                logger.info("Turning off CH:%d Note:%d.", channel, note)
+                with self.state_lock:
+                    self.desire(key, False)
+        elif mtype == "note_on":
             # Toggle button state
-            current_state = False
             with self.state_lock:
-                current_state = self.current_state.get((channel, msg.note), False)
-                logger.info(f"Changing state of CH:{channel} Note:{msg.note} from {current_state} to {not current_state}.")
-            return StateChange(channel, msg.note, not current_state, time.time())
-        
-        return None
+                value = self.get_slot(key).value
+                logger.info("Changing state of CH:%d Note:%d from %s to %s.", channel, note, value, not value)
+                self.desire(key, not value)
+
+        self.dirty_ready.set()
 
     def process_state_message(self, msg: mido.Message):
-        channel = getattr(msg, 'channel', 0)
         if msg.type == "note_on":
+            channel = msg.channel
+            note = msg.note
+            value = msg.velocity > 0
+            key = note_key(channel, note)
             with self.state_lock:
-                logger.info(f"Updating state of CH:{channel} Note:{msg.note} to {msg.velocity > 0}")
-                self.current_state[(channel, msg.note)] = msg.velocity > 0
-                # Clean up any pending changes for this note
-                self.pending_changes.pop((channel, msg.note), None)
+                logger.info("Updating state of CH:%d Note:%d to %s", channel, note, value)
+                # Notes reported off only keep a slot while a change for them is pending
+                slot = self.get_slot(key) if value else self.notes.get(key)
+                if slot is None:
+                    return
+                slot.value = value
+                # The sent change has landed, later changes can go out right away
+                slot.last_emit = None
+                self.discard_idle_slot(key, slot)
 
-    def hardware_thread_func(self):
-        try:
-            for msg in self.hardware_device:
-                if self._stop_event.is_set():
-                    break
-                
-                state_change = self.process_hardware_message(msg)
-                if state_change:
-                    self.output_queue.put(state_change)
-                
-                if WRITE_TO_MIDI:
-                    self.software_device.send(msg)
-        except KeyboardInterrupt:
-            pass
+    def on_hardware_message(self, msg: mido.Message):
+        if self._stop_event.is_set():
+            return
 
-    def state_thread_func(self):
-        try:
-            for msg in self.state_device:
-                if self._stop_event.is_set():
-                    break
-                
-                channel = getattr(msg, 'channel', 0)
-                logger.info(f'State CH:{channel} Note:{msg.note} Vel:{msg.velocity}')
-                self.process_state_message(msg)
-        except KeyboardInterrupt:
-            pass
+        self.process_hardware_message(msg)
+
+        if WRITE_TO_MIDI:
+            self.software_device.send(msg)
+
+    def on_state_message(self, msg: mido.Message):
+        if self._stop_event.is_set():
+            return
+
+        if msg.type not in NOTE_MESSAGE_TYPES:
+            return
+        logger.info('State CH:%d Note:%d Vel:%d', msg.channel, msg.note, msg.velocity)
+        self.process_state_message(msg)
 
     def output_thread_func(self):
+        info_enabled = logger.isEnabledFor(logging.INFO)  # logging is configured before the monitor starts
+        # bind everything the drain loop touches to locals, notes is only ever cleared in place
+        stopped = self._stop_event.is_set
+        dirty_ready = self.dirty_ready
+        dirty_keys = self.dirty_keys
+        next_key = dirty_keys.popleft
+        find_slot = self.notes.get
+        discard_idle_slot = self.discard_idle_slot
+        state_lock = self.state_lock
+        monotonic_ns = time.monotonic_ns
+        Message = mido.Message
+        send = self.software_device.send
+        log_info = logger.info
         try:
-            while not self._stop_event.is_set():
-                try:
-                    state_change = self.output_queue.get(timeout=0.1)
-                    current_time = time.time()
-                    
-                    # Only process if enough time has passed since the last change
-                    key = (state_change.channel, state_change.note)
-                    
-                    with self.state_lock:
-                        pending = self.pending_changes.get(key)
-                        current_state = self.current_state.get(key, False)
-                        
-                        if (not pending or 
-                            current_time - pending.timestamp >= 0.1) and \
-                            current_state != state_change.value:
-                            
-                            # Send MIDI message
-                            msg = mido.Message(
-                                "note_on",
-                                channel=state_change.channel,
-                                note=state_change.note,
-                                velocity=1 if state_change.value else 0
-                            )
-                            if WRITE_TO_MIDI:
-                                self.software_device.send(msg)
-                                logger.info(f"Sending MIDI {msg}")
-                            else:
-                                logger.info(f"Debug not sending MIDI {msg}")
-                            
-                            # Update pending changes
-                            self.pending_changes[key] = state_change
-                            
-                except Queue.Empty:
-                    continue
+            while not stopped():
+                dirty_ready.wait()
+                dirty_ready.clear()  # cleared before draining so keys added meanwhile set it again
+
+                while dirty_keys:
+                    key = next_key()
+                    current_time = monotonic_ns()
+
+                    with state_lock:
+                        slot = find_slot(key)
+                        if slot is None:
+                            continue
+                        slot.queued = False  # from here on a new change queues the key again
+                        if slot.value == slot.desired:
+                            discard_idle_slot(key, slot)
+                            continue
+                        # Only send if enough time has passed since the last change was sent
+                        if slot.last_emit is not None and current_time - slot.last_emit < EMIT_INTERVAL_NS:
+                            continue
+                        slot.last_emit = current_time
+                        value = slot.desired
+
+                    # Send MIDI message
+                    channel, note = split_note_key(key)
+                    msg = Message(
+                        "note_on",
+                        channel=channel,
+                        note=note,
+                        velocity=1 if value else 0
+                    )
+                    if WRITE_TO_MIDI:
+                        send(msg)
+                        if info_enabled:
+                            log_info("Sending MIDI %s", msg)
+                    elif info_enabled:
+                        log_info("Debug not sending MIDI %s", msg)
         except KeyboardInterrupt:
             pass
 
-    def run(self):
-        process_monitor = ProcessMonitor(self.process_name, self)
-        threads = [
-            (process_monitor, "Process Monitor"),
-            (threading.Thread(target=self.hardware_thread_func), "Hardware Thread"),
-            (threading.Thread(target=self.state_thread_func), "State Thread"),
+    def start(self):
+        self.threads = [
+            (ProcessMonitor(self.process_name, self), "Process Monitor"),
             (threading.Thread(target=self.output_thread_func), "Output Thread")
         ]
-        
+
         # Start all threads
-        for thread, name in threads:
+        for thread, name in self.threads:
             thread.start()
             print(f"Started {name}")
 
-        try:
-            while not self._stop_event.is_set():
-                time.sleep(1)
-        except KeyboardInterrupt:
-            pass
-        finally:
-            self._stop_event.set()
-            for thread, name in threads:
-                print(f"Stopping {name}")
-                if isinstance(thread, ProcessMonitor):
-                    thread.stop()
-                thread.join(timeout=1)
-                if thread.is_alive():
-                    print(f"{name} failed to terminate properly")
+    def join(self):
+        # called after stop()
+        for thread, name in self.threads:
+            print(f"Stopping {name}")
+            if isinstance(thread, ProcessMonitor):
+                thread.stop()
+            thread.join()
+        self.software_device.close()
 
 class UnixTimeFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
@@ -252,17 +319,15 @@ def main():
     midi_monitor.start()
 
     try:
-        while True:
+        # sleep on the stop event instead of spinning, waking every second so Ctrl+C is still delivered on Windows
+        while not midi_monitor._stop_event.wait(timeout=1):
             pass
     except KeyboardInterrupt:
         print("\nStopping MIDI monitoring...")
-
         midi_monitor.stop()
-         # Wait for threads to terminate with a timeout
-        midi_monitor.join(timeout=1)  # Timeout set to 1 seconds
-        if midi_monitor.is_alive():
-            print("Threads failed to terminate. Exiting without clean shutdown.", file=sys.stderr)
-            os._exit(1) # Exit with an error code if threads fail to terminate within the timeout
+
+    # every worker wakes on the stop event, so this returns once they have all wound down
+    midi_monitor.join()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file